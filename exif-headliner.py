@@ -7,17 +7,19 @@ directory structure patterns. It extracts year and headline information from
 folder names and applies metadata templates to ensure consistent tagging.
 
 Author: Edmond Shapiro
-Version: 1.0.4
+Version: 1.1.0
 Created: 5 September 2025
-Last Modified: 13 September 2025
+Last Modified: 15 October 2026
 
 Dependencies:
     - exiftool (external command-line tool)
     - Python 3.6+ with standard library modules
+    - orjson (optional, speeds up parsing exiftool's JSON output)
 
 Usage:
     python exif-headliner.py --directory "2007 Print Quality"
     python exif-headliner.py --current --debug
+    python exif-headliner.py --directory "2007 Print Quality" --jobs 4
 
 Version History:
     1.0.0 - Initial release
@@ -25,9 +27,12 @@ Version History:
     1.0.2 - Added version tracking and documentation headers
     1.0.3 - Added checkpoint file to prevent duplicate processing of directories
     1.0.4 - Added support for more file types and metadata fields
+    1.0.5 - Reuse a single persistent exiftool process (-stay_open) for all reads and writes
+    1.0.6 - Read and write metadata in batches of files per exiftool command
+    1.1.0 - Added --jobs to process batches in parallel worker processes
 """
 
-__version__ = "1.0.4"
+__version__ = "1.1.0"
 __author__ = "Edmond Shapiro"
 __email__ = "eshapiro@gmail.com"
 __license__ = "MIT"  
@@ -37,13 +42,22 @@ import os
 import re
 import json
 import argparse
+import multiprocessing
+import multiprocessing.util
+import queue
 import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 from pathlib import Path
 
+try:
+    import orjson  # optional, much faster JSON parsing of exiftool output
+except ImportError:
+    orjson = None
+
 # --- FIXED ROOT DIRECTORY ---
 SMB_URL = "smb://edmonds@SFDS920/photo"
 VOLUME_PATH = "/Volumes/photo"
@@ -51,6 +65,48 @@ ARCHIVE_ROOT = Path(VOLUME_PATH + "/shapfam/")
 #ARCHIVE_ROOT = Path("/Volumes/photo/shapfam-iptc-modify/")
 TEMPLATE_FILE = "/Volumes/photo/other/tools/python/exif/exif-headliner/metadata_template.json"
 CHECKPOINT_FILENAME = ".processed_marker"  # can add prefix/suffix if needed
+PROGRESS_FILENAME = CHECKPOINT_FILENAME + ".files"  # names of files done in an unfinished directory
+BATCH_SIZE = 100  # files read/written per exiftool command
+# File extensions (lowercase, without the dot) that are sent to exiftool.
+#MEDIA_EXTENSIONS = frozenset({
+#    "nef", "cr3", "psd", "jpg", "jpeg", "png", "tif", "tiff",
+#    "heic", "heif", "dng", "avif", "mov", "mp4", "m4a"
+#})
+MEDIA_EXTENSIONS = frozenset({
+    "nef", "cr3", "jpg", "jpeg", "png", "tif", "tiff",
+    "heic", "heif", "dng", "avif", "m4a"
+})
+# Formats where exiftool -fast2 stops at the image/media data (PNG IDAT, QuickTime mdat)
+# and could miss metadata stored after it; these are always read in full.
+FULL_READ_EXTENSIONS = (".png", ".cr3", ".heic", ".heif", ".avif", ".m4a")
+
+# --- FOLDER NAME PATTERNS ---
+_YEAR_RE = re.compile(r"(\d{4})")
+_DATED_RE = re.compile(r"(\d{4})-\d{2}-\d{2}(?:[ _-]+(.+))?")
+_YEAR_TEXT_RE = re.compile(r"(\d{4})[ _-]+(.+)")
+_YEAR_ONLY_RE = re.compile(r"^\d{4}$")
+
+# --- TEMPLATE PLACEHOLDERS ---
+YEAR_TOKEN = sys.intern("{year}")
+SUBDIR_TOKEN = sys.intern("{subdir_text}")
+NO_PLACEHOLDERS = frozenset()
+# Matches only the two placeholders, so any other braces in a value are kept literally.
+_PLACEHOLDER_RE = re.compile(r"\{(year|subdir_text)\}")
+
+# --- PER-WORKER STATE (set by _init_worker) ---
+_worker_daemon = None
+_worker_template = None
+_worker_tag_args = ()
+_worker_debug = False
+_log_queue = None
+
+if orjson is not None:
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+else:
+    json_loads = json.loads
+    def json_dumps(obj):
+        return json.dumps(obj).encode("utf-8")
 
 
 def is_volume_responsive(volume_path, timeout=5):
@@ -115,233 +171,666 @@ def load_template(template_file):
     with open(template_file, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def extract_year_and_headline(file_path: Path, debug: bool = False):
+def extract_year_and_headline(directory: Path, debug: bool = False):
     """
     Extract year and headline from directory structure.
     A more specific folder name (like 2006-01-01 Vail) overrides a less specific one (like 2006 Print).
+    Only folder names are considered, so this is computed once per directory and shared by its files.
     """
-    parts = file_path.parts
+    parts = directory.parts
     year, headline = None, None
+    dated_match, year_text_match = None, None
     for p in parts:
-        match = re.match(r"(\d{4})", p)
-        if match:
-            year = match.group(1)
-    for p in parts:
-        m = re.match(r"(\d{4})-\d{2}-\d{2}(?:[ _-]+(.+))?", p)
-        if m:
-            year = m.group(1)
-            headline = m.group(2) if len(m.groups()) > 1 and m.group(2) else None
-    for p in parts:
-        m = re.match(r"(\d{4})[ _-]+(.+)", p)
-        if m and not headline:
-            year = m.group(1)
-            headline = m.group(2)
-    if not headline and len(parts) > 1:
-        candidate_headline = parts[-2]
-        if not re.match(r"^\d{4}$", candidate_headline):
+        match = _YEAR_RE.match(p)
+        if not match:
+            continue  # the other patterns all start with a year too
+        year = match.group(1)
+        # The last dated folder wins; the first "year text" folder is the fallback.
+        dated_match = _DATED_RE.match(p) or dated_match
+        if year_text_match is None:
+            year_text_match = _YEAR_TEXT_RE.match(p)
+    if dated_match:
+        year = dated_match.group(1)
+        headline = dated_match.group(2) or None
+    if year_text_match and not headline:
+        year = year_text_match.group(1)
+        headline = year_text_match.group(2)
+    if not headline and parts:
+        candidate_headline = parts[-1]
+        if not _YEAR_ONLY_RE.match(candidate_headline):
             headline = candidate_headline
     return year, headline
 
-def get_current_metadata_from_cli(file_path: Path):
+def log(message=""):
     """
-    Reads all metadata from a file and its sidecar using a direct subprocess call to exiftool,
-    returning a Python dictionary.
+    Print a line of output. Inside a worker process the line is handed to the main
+    process instead, so output from concurrent workers never interleaves mid-line.
+    """
+    if _log_queue is not None:
+        _log_queue.put(str(message))
+    else:
+        print(message)
+
+def _print_log(log_queue):
+    """Logger thread: print lines from worker processes until a None sentinel arrives."""
+    for message in iter(log_queue.get, None):
+        print(message)
+
+
+class ExifToolDaemonError(subprocess.SubprocessError):
+    """exiftool timed out or exited mid-command; the daemon has already been restarted."""
+
+
+class ExifToolDaemon:
+    """
+    A single long-running exiftool process started in -stay_open mode.
+
+    Commands are streamed to exiftool's stdin one argument per line and each
+    response is framed by a unique {readyN} sentinel on stdout (from -executeN)
+    and on stderr (from -echo4), so the Perl startup cost is paid only once.
+    If exiftool hangs or dies, it is killed and replaced with a fresh process
+    and the command in flight raises ExifToolDaemonError.
+    """
+
+    def __init__(self, executable: str = "exiftool", timeout: float = 15):
+        self.args = [executable, "-stay_open", "True", "-@", "-"]
+        # Seconds allowed per file in a command, as with the per-file exiftool calls.
+        self.timeout = timeout
+        self._counter = 0
+        # One scratch file for -json= updates, rewritten for every write and removed on close.
+        # stdin already carries the -stay_open command stream, so -json=- is not an option.
+        fd, self.json_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            self.args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        # stdout and stderr are drained on background threads so reads can time out, and
+        # a chatty command can never fill one pipe while we are blocked on the other.
+        self._stdout_lines = queue.Queue()
+        self._stderr_lines = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._drain, args=(self.process.stdout, self._stdout_lines), daemon=True),
+            threading.Thread(target=self._drain, args=(self.process.stderr, self._stderr_lines), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @staticmethod
+    def _drain(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(b"")
+
+    def _restart(self, timed_out=False):
+        """Replace a hung or dead exiftool with a fresh process and return the error to raise."""
+        if timed_out:
+            self.process.kill()
+        try:
+            returncode = self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            returncode = self.process.wait()
+        self._start()
+        reason = "did not respond in time" if timed_out else f"exited with status {returncode}"
+        return ExifToolDaemonError(f"exiftool {reason}; restarted it")
+
+    def _read_until(self, lines_queue, sentinel, deadline):
+        lines = []
+        while True:
+            try:
+                line = lines_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise self._restart(timed_out=True) from None
+            if not line:
+                raise self._restart()
+            if line.rstrip(b"\r\n") == sentinel:
+                return b"".join(lines)
+            lines.append(line)
+
+    def _send(self, args, file_count):
+        """
+        Send one command to exiftool and return the sentinel that will frame its response,
+        along with the deadline for reading that response.
+        """
+        self._counter += 1
+        sentinel = f"{{ready{self._counter}}}"
+        command = args + ["-echo4", sentinel, f"-execute{self._counter}"]
+        try:
+            self.process.stdin.write(("\n".join(command) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise self._restart() from None
+        return sentinel.encode(), time.monotonic() + self.timeout * max(1, file_count)
+
+    def _check(self, args, sentinel, deadline, stdout):
+        """Read the command's stderr and raise CalledProcessError if exiftool reported an error."""
+        stderr = self._read_until(self._stderr_lines, sentinel, deadline)
+        stderr = stderr.decode("utf-8", errors="replace")
+        if any(line.startswith("Error") for line in stderr.splitlines()):
+            raise subprocess.CalledProcessError(1, args, output=stdout, stderr=stderr)
+
+    def execute(self, *args, file_count: int = 1):
+        """
+        Run one exiftool command on `file_count` files and return its stdout as bytes.
+        Raises CalledProcessError if exiftool reported an error, mirroring check=True,
+        and ExifToolDaemonError if exiftool hung or exited.
+        """
+        args = list(args)
+        sentinel, deadline = self._send(args, file_count)
+        stdout = self._read_until(self._stdout_lines, sentinel, deadline)
+        self._check(args, sentinel, deadline, stdout)
+        return stdout
+
+    def read_json(self, paths, *options):
+        """Return exiftool's -j output for the given paths as a list of dictionaries."""
+        output = self.execute("-j", "-m", *options, *paths, file_count=len(paths))
+        return json_loads(output) if output.strip() else []
+
+    def write_json(self, json_data, paths):
+        """Apply a list of -json updates to the given paths, returning exiftool's stdout."""
+        with open(self.json_path, "wb") as f:
+            f.write(json_dumps(json_data))
+        output = self.execute(f"-json={self.json_path}", "-overwrite_original", "-m", *paths, file_count=len(paths))
+        return output.decode("utf-8", errors="replace")
+
+    def close(self):
+        """Ask exiftool to exit and wait for it."""
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(b"-stay_open\nFalse\n")
+                self.process.stdin.flush()
+                self.process.stdin.close()
+                self.process.wait(timeout=15)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        try:
+            os.unlink(self.json_path)
+        except FileNotFoundError:
+            pass
+
+def get_metadata_batch(files, xmp_names: dict, daemon: ExifToolDaemon, tag_args=()):
+    """
+    Reads metadata for a batch of files and their .xmp sidecars with a single exiftool call,
+    returning a {SourceFile: dict} map keyed by each image path. Sidecar values override
+    the values read from the image itself. `files` are path strings; `xmp_names` maps the
+    lowercased names of the .xmp files in the batch's directory to their real names, so
+    sidecars are found without a stat() per file and whatever the case of their extension.
+    `tag_args` (see template_tag_args) limits the read to the given tags; without it every
+    tag is returned.
+    """
+    metadata_map = {file_path: {} for file_path in files}
+    sidecars = {}
+    files_to_read = list(files)
+    for file_path in files:
+        # Same name as Path.with_suffix(".xmp"), without building a Path per file.
+        xmp_name = xmp_names.get(os.path.basename(file_path[:file_path.rfind(".")]).lower() + ".xmp")
+        if xmp_name is not None:
+            sidecars.setdefault(os.path.join(os.path.dirname(file_path), xmp_name), []).append(file_path)
+    files_to_read.extend(sidecars)
+
+    # -fast2 only parses the header blocks that hold EXIF/IPTC/XMP, except in containers
+    # where exiftool would stop before metadata stored after the image/media data.
+    fast_paths = [path for path in files_to_read if not path.lower().endswith(FULL_READ_EXTENSIONS)]
+    full_paths = [path for path in files_to_read if path.lower().endswith(FULL_READ_EXTENSIONS)]
+    metadata_list = []
+    for options, paths in ((["-fast2"], fast_paths), ([], full_paths)):
+        if not paths:
+            continue
+        try:
+            try:
+                metadata_list.extend(daemon.read_json(paths, *options, *tag_args))
+            except subprocess.CalledProcessError as e:
+                # Errors on individual files should not discard the metadata read for the rest.
+                log(f"Error reading metadata: {e.stderr.strip()}")
+                metadata_list.extend(json_loads(e.output) if e.output.strip() else [])
+        except json.JSONDecodeError as e:
+            log(f"Error reading metadata for {len(paths)} files: {e}")
+
+    # Each image's own dict is used as-is; a sidecar is merged in with one dict build.
+    sidecar_items = []
+    for item in metadata_list:
+        source_file = item.get("SourceFile")
+        if source_file in sidecars:
+            sidecar_items.append(item)
+        elif source_file in metadata_map:
+            metadata_map[source_file] = item
+    for item in sidecar_items:
+        for source_file in sidecars[item["SourceFile"]]:
+            metadata_map[source_file] = {**metadata_map[source_file], **item}
+    return metadata_map
+
+def _placeholder_requires(value):
+    """Return the set of placeholder names ("year", "subdir_text") a template value needs."""
+    if not isinstance(value, str):
+        return NO_PLACEHOLDERS
+    return frozenset(name for name, token in (("year", YEAR_TOKEN), ("subdir_text", SUBDIR_TOKEN)) if token in value)
+
+def _resolve(value, requires, year, headline, available):
+    """
+    Fill {year} and {subdir_text} into a template value in a single pass.
+    Returns (value, complete), where complete is False if a placeholder the
+    value requires is not in `available`. Such values are never used filled in,
+    so they are returned untouched without doing the substitution.
+    """
+    if not requires:
+        return value, True
+    if requires - available:
+        return value, False
+    value = _PLACEHOLDER_RE.sub(lambda m: year if m.group(1) == "year" else headline, value)
+    return value, True
+
+def _bare_tag_name(key):
+    """Drop a tag's group prefix ("XMP-dc:Creator" -> "Creator"), as exiftool's -j output keys do."""
+    return key.rsplit(":", 1)[-1]
+
+def compile_template(template):
+    """
+    Preprocess the template once so the per-file loop does no key normalization or
+    placeholder scanning. Returns a list of
+    (key, normalized_key, default_value, requires, parts) tuples, where `requires` is
+    the frozenset of placeholder names the value needs and `parts` holds
+    (sub_key, sub_value, requires) for struct values, (item, requires) for list values,
+    and is None otherwise.
+    """
+    prepared = []
+    for key, default_value in template.items():
+        if key == "SourceFile":
+            continue
+        normalized_key = _bare_tag_name(key).lower()
+        parts = None
+        if isinstance(default_value, dict):
+            parts = [(sub_key, sub_value, _placeholder_requires(sub_value)) for sub_key, sub_value in default_value.items()]
+        elif isinstance(default_value, list):
+            parts = [(item, _placeholder_requires(item)) for item in default_value]
+        prepared.append((key, normalized_key, default_value, _placeholder_requires(default_value), parts))
+    return prepared
+
+def template_tag_args(template):
+    """
+    Returns exiftool arguments that request only the tags named in the compiled template.
+    Tags are requested by bare name, without their group, because exiftool's -j output
+    keys are bare names and that is what compute_updates matches against. Placeholder
+    cleanup therefore only looks at these tags, which are the only ones it can affect.
+    -struct is added for struct values so they come back as one nested dictionary under
+    the struct's own name instead of being flattened into separate tags.
+    """
+    tag_args = []
+    for key, _, default_value, *_ in template:
+        tag_arg = "-" + _bare_tag_name(key)
+        if tag_arg not in tag_args:
+            tag_args.append(tag_arg)
+        if isinstance(default_value, dict) and "-struct" not in tag_args:
+            tag_args.insert(0, "-struct")
+    return tag_args
+
+def _is_empty(value):
+    return value is None or value == "" or value == []
+
+def _current_value(normalized_metadata, normalized_key):
+    current_value = normalized_metadata.get(normalized_key)
+    if isinstance(current_value, list) and len(current_value) == 1:
+        current_value = current_value[0]
+    return current_value
+
+def _existing_struct(normalized_metadata, normalized_key):
+    existing_struct = normalized_metadata.get(normalized_key)
+    return existing_struct if isinstance(existing_struct, dict) else {}
+
+def has_missing_fields(normalized_metadata, template) -> bool:
+    """
+    Cheap pre-check: returns True as soon as one template field (or struct sub-field)
+    is empty or was cleared because it still held a placeholder.
+    """
+    for key, normalized_key, default_value, _, parts in template:
+        if isinstance(default_value, dict):
+            existing_struct = _existing_struct(normalized_metadata, normalized_key)
+            if any(_is_empty(existing_struct.get(sub_key)) for sub_key, *_ in parts):
+                return True
+        elif _is_empty(_current_value(normalized_metadata, normalized_key)):
+            return True
+    return False
+
+def compute_updates(metadata, template, year, headline, debug: bool = False):
+    """
+    Return the template fields missing from a file's metadata, with placeholders filled in.
+    `template` is the list returned by compile_template.
     """
-    try:
-        xmp_file_path = file_path.with_suffix(".xmp")
-        files_to_read = [str(file_path)]
-        if xmp_file_path.exists():
-            files_to_read.append(str(xmp_file_path))
-        
-        cmd = ["exiftool", "-j", "-m"] + files_to_read
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=15)
-        
-        metadata_list = json.loads(result.stdout)
-        merged_metadata = {}
-        for item in metadata_list:
-            merged_metadata.update(item)            
-        return merged_metadata
-    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
-        print(f"Error reading metadata from {file_path}: {e}")
-        return {}
-
-def update_metadata(file_path: Path, template, year, headline, debug: bool = False):
-    """Update only missing fields in metadata using ExifTool."""
-    metadata = get_current_metadata_from_cli(file_path)
     updates = {}
     cleaned_metadata = {}
     for key, value in metadata.items():
-        if isinstance(value, str) and ("{subdir_text}" in value or "{year}" in value):
+        if isinstance(value, str) and (SUBDIR_TOKEN in value or YEAR_TOKEN in value):
             cleaned_metadata[key] = None
         else:
             cleaned_metadata[key] = value
     metadata = cleaned_metadata
-    normalized_metadata = {key.replace("XMP-", "").replace("Iptc4xmpCore:", "").replace("photoshop:", "").lower(): value for key, value in metadata.items()}
+    normalized_metadata = {_bare_tag_name(key).lower(): value for key, value in metadata.items()}
     if debug:
-        print(f"[DEBUG] Full Metadata Dict: {metadata}")
-        print(f"[DEBUG] Normalized Metadata Dict: {normalized_metadata}")
-    for key, default_value in template.items():
-        if key == "SourceFile":
-            continue
-        normalized_key = key.replace("XMP-", "").replace("Iptc4xmpCore:", "").replace("photoshop:", "").lower()
+        log(f"[DEBUG] Full Metadata Dict: {metadata}")
+        log(f"[DEBUG] Normalized Metadata Dict: {normalized_metadata}")
+    # Fully tagged files are the common case on re-runs; skip the substitution work for them.
+    if not has_missing_fields(normalized_metadata, template):
+        if debug:
+            log("[DEBUG] All template fields already set")
+        return updates
+    # Placeholders that can be filled for this directory; entries needing others are skipped.
+    available = frozenset(name for name, value in (("year", year), ("subdir_text", headline)) if value)
+    for key, normalized_key, default_value, requires, parts in template:
         if debug:
-            print(f"[DEBUG] Checking key: {key} (Normalized: {normalized_key})")
-        current_value = normalized_metadata.get(normalized_key)
-        if isinstance(current_value, list) and len(current_value) == 1:
-            current_value = current_value[0]
+            log(f"[DEBUG] Checking key: {key} (Normalized: {normalized_key})")
+        current_value = _current_value(normalized_metadata, normalized_key)
         if debug:
-            print(f"[DEBUG] Current value for '{key}': {current_value}")
+            log(f"[DEBUG] Current value for '{key}': {current_value}")
         if isinstance(default_value, dict):
-            existing_struct = metadata.get(key, {})
-            if existing_struct is None:
-                if key.startswith("XMP-"):
-                    fallback_key = key[4:]
-                    existing_struct = metadata.get(fallback_key, {})
+            existing_struct = _existing_struct(normalized_metadata, normalized_key)
             struct_to_update = {}
-            for sub_key, sub_value in default_value.items():
+            for sub_key, sub_value, sub_requires in parts:
                 current_sub_value = existing_struct.get(sub_key)
-                if current_sub_value is None or current_sub_value == "" or current_sub_value == []:
-                    value = sub_value
-                    if year and isinstance(value, str) and "{year}" in value:
-                        value = value.replace("{year}", year)
-                    if headline and isinstance(value, str) and "{subdir_text}" in value:
-                        value = value.replace("{subdir_text}", headline)
-                    if isinstance(value, str) and "{year}" not in value and "{subdir_text}" not in value:
-                        struct_to_update[sub_key] = value
-                    else:
-                        struct_to_update[sub_key] = sub_value
+                if _is_empty(current_sub_value):
+                    value, complete = _resolve(sub_value, sub_requires, year, headline, available)
+                    struct_to_update[sub_key] = value if complete else sub_value
             if struct_to_update:
                 updates[key] = struct_to_update
             continue
-        if current_value is None or current_value == "" or current_value == []:
-            value_to_update = default_value
-            if isinstance(default_value, str):
-                value = default_value
-                if year and isinstance(value, str) and "{year}" in value:
-                    value = value.replace("{year}", year)
-                if headline and isinstance(value, str) and "{subdir_text}" in value:
-                    value = value.replace("{subdir_text}", headline)
-                if "{year}" not in value and "{subdir_text}" not in value:
-                    value_to_update = value
-            elif isinstance(default_value, list):
-                new_list = []
-                for item in default_value:
-                    value = item
-                    if year and isinstance(value, str) and "{year}" in value:
-                        value = value.replace("{year}", year)
-                    if headline and isinstance(value, str) and "{subdir_text}" in value:
-                        value = value.replace("{subdir_text}", headline)
-                    if isinstance(value, str) and "{year}" not in value and "{subdir_text}" not in value:
-                        new_list.append(value)
-                    elif not isinstance(value, str):
-                        new_list.append(item)
-                value_to_update = new_list
+        if _is_empty(current_value):
+            if isinstance(default_value, list):
+                value_to_update = []
+                for item, item_requires in parts:
+                    if item_requires - available:
+                        continue
+                    value, _ = _resolve(item, item_requires, year, headline, available)
+                    value_to_update.append(value)
+            else:
+                # An unresolved scalar keeps its raw template text, as before.
+                value, complete = _resolve(default_value, requires, year, headline, available)
+                value_to_update = value if complete else default_value
             updates[key] = value_to_update
-    if updates:
-        json_data = [{ "SourceFile": str(file_path), **updates }]
-        if debug:
-            print(f"[DEBUG] Would update {file_path} with JSON:")
-            print(json.dumps(json_data, indent=2))
-        else:
-            try:
-                with tempfile.NamedTemporaryFile(mode='w+', suffix=".json", encoding="utf-8") as temp_f:
-                    json.dump(json_data, temp_f)
-                    temp_f.flush()
-                    cmd_args = ["exiftool", f"-json={temp_f.name}", "-overwrite_original", "-m", str(file_path)]
-                    result = subprocess.run(cmd_args, check=True, capture_output=True, text=True, timeout=15)
-                    print(f"Updated {file_path}")
-                    if result.stdout.strip():
-                        print(result.stdout.strip())
-            except subprocess.CalledProcessError as e:
-                print(f"Error updating {file_path} with exiftool.")
-                print(f"Stderr: {e.stderr}")
-            except FileNotFoundError:
-                print("Error: 'exiftool' command not found. Please ensure it is installed and in your PATH.")
-
-def traverse_and_update(archive_dir, template, debug: bool = False):
-    """Walk through archive and update files as needed."""
-    for root, dirs, files in os.walk(archive_dir):
+    return updates
+
+def update_metadata(files, xmp_names: dict, template, year, headline, daemon: ExifToolDaemon, debug: bool = False, tag_args=()):
+    """
+    Update only missing fields in metadata using ExifTool.
+    `files` all come from one directory and share its year and headline; they are read
+    with one exiftool call and, if anything is missing, written back with one more.
+    exiftool carries on past files it cannot write, so when the write reports errors only
+    the files named in its "Error: ... - <path>" lines are treated as failed.
+    Returns the files that were processed successfully.
+    """
+    try:
+        metadata_map = get_metadata_batch(files, xmp_names, daemon, tag_args)
+    except ExifToolDaemonError as e:
+        log(f"Error reading metadata for {len(files)} files: {e}")
+        return []
+    json_data = []
+    for file_path in files:
+        updates = compute_updates(metadata_map[file_path], template, year, headline, debug)
+        if updates:
+            json_data.append({ "SourceFile": file_path, **updates })
+    if not json_data:
+        return files
+    if debug:
+        for entry in json_data:
+            log(f"[DEBUG] Would update {entry['SourceFile']} with JSON:")
+            log(json.dumps([entry], indent=2))
+        return files
+    failed = set()
+    try:
+        output = daemon.write_json(json_data, [entry["SourceFile"] for entry in json_data])
+    except subprocess.CalledProcessError as e:
+        log(f"Error updating {len(json_data)} files with exiftool.")
+        log(f"Stderr: {e.stderr}")
+        failed = _error_paths(e.stderr) & {entry["SourceFile"] for entry in json_data}
+        if not failed:
+            # The error does not name a file in this batch, so none of it can be trusted.
+            return []
+        output = e.output.decode("utf-8", errors="replace")
+    except ExifToolDaemonError as e:
+        log(f"Error updating {len(json_data)} files: {e}")
+        return []
+    for entry in json_data:
+        if entry["SourceFile"] not in failed:
+            log(f"Updated {entry['SourceFile']}")
+    if output.strip():
+        log(output.strip())
+    return [file_path for file_path in files if file_path not in failed]
+
+def _error_paths(stderr):
+    """Return the file paths named at the end of exiftool's "Error: ... - <path>" lines."""
+    return {
+        line.rpartition(" - ")[2]
+        for line in stderr.splitlines()
+        if line.startswith("Error") and " - " in line
+    }
+
+def _init_worker(template, debug: bool, log_queue):
+    """Pool initializer: give each worker process its own persistent exiftool daemon."""
+    global _worker_daemon, _worker_template, _worker_tag_args, _worker_debug, _log_queue
+    _worker_template = template
+    _worker_tag_args = template_tag_args(template)
+    _worker_debug = debug
+    _log_queue = log_queue
+    _worker_daemon = ExifToolDaemon()
+    # Close exiftool cleanly when the pool shuts the worker down.
+    multiprocessing.util.Finalize(_worker_daemon, _worker_daemon.close, exitpriority=16)
+
+def update_one(task):
+    """
+    Worker entry point: update one batch of files with the worker-local daemon.
+    Returns the batch's directory, the files that were processed successfully and the
+    batch count so the main process can record progress and mark the directory
+    completed once all of its batches are done.
+    """
+    relative_path, files, xmp_names, year, headline, batch_count = task
+    if files:
+        files = update_metadata(files, xmp_names, _worker_template, year, headline, _worker_daemon, _worker_debug, _worker_tag_args)
+        time.sleep(0.1)
+    return relative_path, files, batch_count
+
+def walk_scandir(top):
+    """
+    Top-down, iterative equivalent of os.walk built directly on os.scandir.
+    Yields (dirpath, subdirs, files) where subdirs and files are lists of os.DirEntry,
+    so callers get names and full paths without building Path objects or re-stat'ing.
+    As with os.walk, removing entries from subdirs prunes them from the walk, and
+    symlinked directories are listed but not descended into.
+    """
+    stack = [os.fspath(top)]
+    while stack:
+        dirpath = stack.pop()
+        subdirs, files = [], []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    (subdirs if is_dir else files).append(entry)
+        except OSError:
+            continue
+        yield dirpath, subdirs, files
+        stack.extend(entry.path for entry in reversed(subdirs) if not entry.is_symlink())
+
+def generate_tasks(archive_dir, debug: bool = False):
+    """
+    Walk through archive and yield (relative_path, files, xmp_names, year, headline, batch_count) tasks.
+    Every directory that is not skipped yields at least one task, even when it has
+    no matching files, so that it still gets marked completed.
+    """
+    for root, dirs, files in walk_scandir(archive_dir):
         root_path = Path(root)
         try:
             relative_path = root_path.relative_to(archive_dir)
         except ValueError:
             relative_path = root_path  # This handles the case where archive_dir is the current directory.
 
-        # ✅ Use root_path (real filesystem path) for completion check
-        if is_directory_completed(relative_path, archive_dir):
+        # ✅ The checkpoint file shows up in the listing we already have, so no extra stat
+        file_names = {entry.name for entry in files}
+        if CHECKPOINT_FILENAME in file_names:
             if debug:
                 print(f"[SKIP] Already processed: {relative_path}")
             dirs[:] = []  # prevent descending further
             continue
-        
-        if "received" in str(relative_path).lower():
-            print(f"Skipping subdirectory '{root}' due to 'Received' keyword.")
-            dirs[:] = []
-            continue
 
-        path_lower = str(relative_path).lower()
-        if "mobile" in path_lower and "edmond" not in path_lower:
-            print(f"Skipping subdirectory '{root}' due to 'Mobile' keyword.")
-            dirs[:] = []
-            continue
-        
-        for file in files:
-#            if file.lower().endswith((
-#                ".nef", ".cr3", ".psd", ".jpg", ".jpeg", ".png", ".tif", ".tiff",
-#                ".heic", ".heif", ".dng", ".avif", ".mov", ".mp4", ".m4a"
-#            )):
-
-            if file.lower().endswith((
-                ".nef", ".cr3", ".jpg", ".jpeg", ".png", ".tif", ".tiff",
-                ".heic", ".heif", ".dng", ".avif", ".m4a"
-            )):
-                file_path = root_path / file
-                
-                # Check if we're using the current directory as the root
-                if archive_dir == Path.cwd():
-                    year, headline = extract_year_and_headline(file_path, debug=debug)
-                else:
-                    year, headline = extract_year_and_headline(file_path.relative_to(archive_dir), debug=debug)
-                
-                update_metadata(file_path, template, year, headline, debug)
-                time.sleep(0.1)
-
-        # ✅ Mark directory as completed after processing all files
-        # Only mark non-root directories
-        if relative_path != Path("."):
-            mark_directory_completed(relative_path, archive_dir)
-
-
-def is_directory_completed(relative_path: Path, root: Path) -> bool:
-    """
-    Returns True if the checkpoint file exists in the directory.
+        # Drop excluded subdirectories before the walk ever lists them.
+        dirs[:] = [entry for entry in dirs if not is_excluded_directory(relative_path / entry.name, entry.path)]
+
+        # Year and headline depend only on the folder names, so extract them once per directory.
+        if archive_dir == Path.cwd():
+            year, headline = extract_year_and_headline(root_path, debug=debug)
+        else:
+            year, headline = extract_year_and_headline(relative_path, debug=debug)
+
+        # Files already updated by an earlier, interrupted run of this directory.
+        if PROGRESS_FILENAME in file_names:
+            processed_files = load_processed_files(relative_path, archive_dir)
+        else:
+            processed_files = set()
+
+        # Sidecars present in this directory, looked up by name instead of stat'ing per file.
+        xmp_names = {name.lower(): name for name in file_names if name.lower().endswith(".xmp")}
+
+        batch = []
+        for entry in files:
+            file = entry.name
+            _, dot, extension = file.rpartition(".")
+            if dot and extension.lower() in MEDIA_EXTENSIONS and file not in processed_files:
+                batch.append(entry.path)
+
+        batches = [batch[start:start + BATCH_SIZE] for start in range(0, len(batch), BATCH_SIZE)] or [[]]
+        for chunk in batches:
+            yield relative_path, chunk, xmp_names, year, headline, len(batches)
+
+def traverse_and_update(archive_dir, template, jobs: int = 1, debug: bool = False):
     """
-    marker_path = root / relative_path / CHECKPOINT_FILENAME
-    return marker_path.exists()
+    Walk through archive and update files as needed, spreading batches across
+    `jobs` worker processes that each own a persistent exiftool daemon.
+    """
+    tasks = generate_tasks(archive_dir, debug)
+    if jobs <= 1:
+        _init_worker(template, debug, None)
+        try:
+            mark_completed_directories(map(update_one, tasks), archive_dir)
+        finally:
+            _worker_daemon.close()
+        return
+
+    log_queue = multiprocessing.Queue()
+    logger = threading.Thread(target=_print_log, args=(log_queue,), daemon=True)
+    logger.start()
+    try:
+        with multiprocessing.Pool(processes=jobs, initializer=_init_worker, initargs=(template, debug, log_queue)) as pool:
+            # Each task is already a batch of files, so hand them out one at a time.
+            mark_completed_directories(pool.imap_unordered(update_one, tasks), archive_dir)
+            pool.close()
+            pool.join()
+    finally:
+        log_queue.put(None)
+        logger.join()
+
+def mark_completed_directories(results, archive_dir):
+    """
+    Consume finished batches, recording progress for directories that still have
+    batches outstanding and marking each directory once all of its batches are done.
+    """
+    remaining = {}
+    for relative_path, files, batch_count in results:
+        remaining[relative_path] = remaining.get(relative_path, batch_count) - 1
+        if remaining[relative_path] > 0:
+            if files:
+                record_processed_files(relative_path, archive_dir, files)
+        else:
+            del remaining[relative_path]
+            # ✅ Mark directory as completed after processing all files
+            # Only mark non-root directories
+            if relative_path != Path("."):
+                mark_directory_completed(relative_path, archive_dir)
+
+
+def is_excluded_directory(relative_path: Path, path) -> bool:
+    """
+    Returns True for directories that are never processed: anything under a "Received"
+    folder, and "Mobile" folders that are not Edmond's.
+    """
+    path_lower = str(relative_path).lower()
+    if "received" in path_lower:
+        print(f"Skipping subdirectory '{path}' due to 'Received' keyword.")
+        return True
+    if "mobile" in path_lower and "edmond" not in path_lower:
+        print(f"Skipping subdirectory '{path}' due to 'Mobile' keyword.")
+        return True
+    return False
 
 
 def mark_directory_completed(relative_path: Path, root: Path):
     """
     Creates a marker file in the given directory to indicate processing is done.
+    The marker is created exclusively, so a directory already marked by another run is left alone.
     """
+    # Per-file progress is no longer needed once the whole directory is done.
+    try:
+        (root / relative_path / PROGRESS_FILENAME).unlink()
+    except FileNotFoundError:
+        pass
     marker_path = root / relative_path / CHECKPOINT_FILENAME
-    with open(marker_path, "w") as f:
-        f.write("processed\n")
+    try:
+        fd = os.open(marker_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return
+    try:
+        os.write(fd, b"processed\n")
+    finally:
+        os.close(fd)
     print(f"[INFO] Marked completed: {relative_path}")
 
 
+def load_processed_files(relative_path: Path, root: Path) -> set:
+    """
+    Returns the names of files already updated in a partially processed directory.
+    """
+    with open(root / relative_path / PROGRESS_FILENAME, "r", encoding="utf-8") as f:
+        return set(f.read().splitlines())
+
+
+def record_processed_files(relative_path: Path, root: Path, files):
+    """
+    Appends the names of updated files to the directory's progress file,
+    so an interrupted run can skip them when it restarts.
+    """
+    with open(root / relative_path / PROGRESS_FILENAME, "a", encoding="utf-8") as f:
+        f.writelines(f"{Path(file_path).name}\n" for file_path in files)
+
+
 
 def cleanup_checkpoints(root_directory: Path):
     """
-    Recursively deletes all checkpoint files under the given root directory.
+    Recursively deletes all checkpoint and progress files under the given root directory.
+    Every directory is visited, so markers left behind by earlier, interrupted runs are removed too.
     """
     removed = 0
-    for marker_path in root_directory.rglob(CHECKPOINT_FILENAME):
-        try:
-            marker_path.unlink()
-            removed += 1
-        except FileNotFoundError:
-            continue
+    checkpoint_names = (CHECKPOINT_FILENAME, PROGRESS_FILENAME)
+    for _, _, files in walk_scandir(root_directory):
+        for entry in files:
+            if entry.name in checkpoint_names:
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    continue
     print(f"[INFO] Removed {removed} checkpoint files under {root_directory}")
 
 
@@ -370,6 +859,12 @@ if __name__ == "__main__":
     )
     
     parser.add_argument("--debug", action="store_true", help="Enable debug mode (print changes, don't write).")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes, each with its own exiftool (default: number of CPUs)."
+    )
     args = parser.parse_args()
 
     if not is_volume_responsive(VOLUME_PATH):
@@ -392,10 +887,15 @@ if __name__ == "__main__":
 
     template_data = load_template(TEMPLATE_FILE)
     template = template_data[0] if isinstance(template_data, list) else template_data
+    template = compile_template(template)
+
+    if shutil.which("exiftool") is None:
+        print("Error: 'exiftool' command not found. Please ensure it is installed and in your PATH.")
+        exit(1)
 
     print(f"Processing directory: {target_dir}")
     # This now calls the correct, full version of the function.
-    traverse_and_update(target_dir, template, debug=args.debug)
+    traverse_and_update(target_dir, template, jobs=args.jobs, debug=args.debug)
 
     # Cleanup checkpoints
     cleanup_checkpoints(target_dir)
\ No newline at end of file